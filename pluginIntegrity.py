@@ -0,0 +1,320 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+
+* File Name : pluginIntegrity.py
+
+* Purpose : Hashing of installed plugin files, the install manifest and the
+            hash cache used by PluginManager.verify().
+
+* Creation Date : 19-10-2026
+
+* Copyright (c) 2016 Mandeep Singh <mandeeps708@gmail.com>
+
+"""
+
+from __future__ import print_function
+import os
+import sys
+import json
+import mmap
+import hashlib
+import contextlib
+import subprocess
+import threading
+import multiprocessing
+try:
+    import fcntl
+except ImportError:
+    # Windows.
+    fcntl = None
+    import msvcrt
+
+"""Files are hashed the way git hashes blobs, i.e. sha1("blob <size>\\0" +
+content). So the hashes of a workbench can be compared directly with the
+ones of the upstream commit it was cloned from.
+"""
+
+# Below this number of files to hash, a process pool isn't worth starting.
+POOL_THRESHOLD = 64
+
+
+def hashFile(path):
+    "Returns the git blob hash of a file, reading it via mmap"
+    size = os.path.getsize(path)
+    sha = hashlib.sha1(("blob %d\0" % size).encode("ascii"))
+    # Empty files can't be memory-mapped.
+    if size:
+        with open(path, "rb") as f:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            try:
+                sha.update(mapped)
+            finally:
+                mapped.close()
+    return sha.hexdigest()
+
+
+def processPool():
+    """Returns a process pool to hash files, or None where one can't be
+       started safely.
+    """
+    # Inside FreeCAD, sys.executable is the FreeCAD binary, not python.
+    if not os.path.basename(sys.executable).lower().startswith("python"):
+        return None
+
+    # Forking a process having other threads may deadlock the children.
+    if threading.active_count() > 1:
+        return None
+
+    # Only "fork" is used: "spawn" (the default on Windows and macOS) runs
+    # the __main__ module of the caller again, and scripts like
+    # getPlugins.py don't guard it.
+    try:
+        if "fork" not in multiprocessing.get_all_start_methods():
+            return None
+        return multiprocessing.get_context("fork").Pool()
+
+    # Python 2 has no start methods, it forks everywhere but on Windows.
+    except AttributeError:
+        if os.name == "nt":
+            return None
+        return multiprocessing.Pool()
+
+
+def hashFiles(paths):
+    """Returns a dict of path: hash. Large batches are hashed in a process
+       pool, where possible.
+    """
+    pool = None
+    if len(paths) >= POOL_THRESHOLD:
+        pool = processPool()
+    if pool is None:
+        return dict((path, hashFile(path)) for path in paths)
+
+    try:
+        hashes = pool.map(hashFile, paths, chunksize=16)
+    finally:
+        pool.close()
+        pool.join()
+    return dict(zip(paths, hashes))
+
+
+def listFiles(root):
+    """Returns the paths (relative to root) of the files of a plugin. root is
+       either a workbench directory or a macro file.
+    """
+    if os.path.isfile(root):
+        return [os.path.basename(root)]
+
+    files = []
+    for dirpath, dirnames, filenames in os.walk(root):
+        # The git metadata isn't a part of the plugin.
+        if ".git" in dirnames:
+            dirnames.remove(".git")
+        for filename in filenames:
+            path = os.path.join(dirpath, filename)
+            if not os.path.islink(path):
+                # Use "/" as in git trees, whatever the platform.
+                files.append(os.path.relpath(path, root).replace(os.sep, "/"))
+    return files
+
+
+def absolutePath(root, relpath):
+    "Returns the absolute path of a file listed by listFiles()"
+    if os.path.isfile(root):
+        return root
+    return os.path.join(root, relpath)
+
+
+def git(root, *args):
+    "Returns the output of a git command run in the repository root"
+    return subprocess.check_output(("git",) + args,
+                                   cwd=root).decode("utf8")
+
+
+def upstreamHashes(root):
+    """Returns a dict of relative path: hash of the files at the upstream
+       commit of a workbench, or None if there isn't any (macros).
+
+       Also None when git converts the line endings on checkout
+       (core.autocrlf=true, the default on Windows), as the files then
+       never match their blobs. Conversions set in .gitattributes aren't
+       detected.
+    """
+    if not os.path.isdir(os.path.join(root, ".git")):
+        return None
+
+    try:
+        try:
+            autocrlf = git(root, "config", "--get", "core.autocrlf")
+        # Exits with 1 if it isn't set.
+        except subprocess.CalledProcessError:
+            autocrlf = ""
+        if autocrlf.strip().lower() == "true":
+            print("Line endings converted, skipping the upstream check of",
+                  root)
+            return None
+
+        listing = git(root, "ls-tree", "-r", "-z", "HEAD")
+
+    except OSError:
+        print("git isn't installed!")
+        return None
+
+    except subprocess.CalledProcessError as error:
+        print("Couldn't read the upstream commit of", root, error)
+        return None
+
+    hashes = {}
+    for entry in listing.split("\0"):
+        if entry:
+            info, path = entry.split("\t", 1)
+            mode, kind, sha = info.split()
+            # Skips symlinks (like listFiles() does) and submodules.
+            if kind == "blob" and mode != "120000":
+                hashes[path] = sha
+    return hashes
+
+
+@contextlib.contextmanager
+def fileLock(path):
+    "Holds an exclusive lock on the file at path, shared by all processes"
+    with open(path, "a+") as f:
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        else:
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+# Marks a key removed in JSONStore.changes.
+REMOVED = object()
+
+
+class JSONStore(object):
+    """A dict persisted as a JSON file. The same store may be shared by
+       several threads, hence the lock, and the same file by several
+       processes: save() merges the changes made through set() and
+       remove() with what the others saved meanwhile.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.RLock()
+        # The keys set or removed since the last save.
+        self.changes = {}
+        self.data = self.load()
+
+    def load(self):
+        try:
+            with open(self.path) as f:
+                return json.load(f)
+        except (IOError, OSError, ValueError):
+            return {}
+
+    def set(self, key, value):
+        with self.lock:
+            self.data[key] = value
+            self.changes[key] = value
+
+    def remove(self, key):
+        with self.lock:
+            self.data.pop(key, None)
+            self.changes[key] = REMOVED
+
+    def save(self):
+        directory = os.path.dirname(self.path)
+        if not os.path.exists(directory):
+            os.makedirs(directory)
+
+        with self.lock:
+            with fileLock(self.path + ".lock"):
+                data = self.load()
+                for key, value in self.changes.items():
+                    if value is REMOVED:
+                        data.pop(key, None)
+                    else:
+                        data[key] = value
+
+                # Write to a temporary file first, so an interrupted save
+                # doesn't leave a truncated store behind.
+                temp_path = "%s.%d.tmp" % (self.path, os.getpid())
+                with open(temp_path, "w") as f:
+                    json.dump(data, f)
+                # os.replace() overwrites on Windows too (not on Python 2).
+                getattr(os, "replace", os.rename)(temp_path, self.path)
+
+            self.data = data
+            self.changes = {}
+
+
+class HashCache(JSONStore):
+    """Caches file hashes by (mtime, size), so that repeat scans only
+       re-hash the files that changed.
+    """
+
+    def hashes(self, paths):
+        "Returns a dict of path: hash, hashing only the changed files"
+        result = {}
+        stale = []
+        for path in paths:
+            stat = os.stat(path)
+            entry = self.data.get(path)
+            if entry and entry[0] == stat.st_mtime and entry[1] == stat.st_size:
+                result[path] = entry[2]
+            else:
+                stale.append((path, stat))
+
+        fresh = hashFiles([path for path, stat in stale])
+        for path, stat in stale:
+            self.set(path, [stat.st_mtime, stat.st_size, fresh[path]])
+        result.update(fresh)
+        return result
+
+    def prune(self, root, paths):
+        """Removes the entries of the files under root (a workbench directory
+           or a macro file) that aren't in paths anymore.
+        """
+        prefix = os.path.join(root, "")
+        paths = set(paths)
+        with self.lock:
+            for path in list(self.data):
+                if (path == root or path.startswith(prefix)) and \
+                        path not in paths:
+                    self.remove(path)
+
+
+class Manifest(JSONStore):
+    "The hashes of the files of each plugin, as recorded at install time"
+
+    def record(self, plugin, cache, root=None):
+        """Records the current files of an installed plugin, found at root
+           (plugin.plugin_dir by default).
+        """
+        root = root or plugin.plugin_dir
+        files = listFiles(root)
+        paths = [absolutePath(root, f) for f in files]
+        hashes = cache.hashes(paths)
+        cache.prune(root, paths)
+        self.set(plugin.name, {
+            "path": root,
+            "files": dict((f, hashes[absolutePath(root, f)])
+                          for f in files)})
+
+
+def compare(expected, actual):
+    "Returns the modified, missing and added files of two path: hash dicts"
+    modified = sorted(f for f in expected
+                      if f in actual and actual[f] != expected[f])
+    missing = sorted(f for f in expected if f not in actual)
+    added = sorted(f for f in actual if f not in expected)
+    return modified, missing, added
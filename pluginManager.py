@@ -22,6 +22,8 @@ from socket import gaierror
 import FreeCAD
 import shutil
 import glob
+import time
+import pluginIntegrity
 # import ipdb
 
 
@@ -46,6 +48,16 @@ class Plugin():
     def __repr__(self):
         return 'Plugin(%s)' % (self.name)
 
+    def toDict(self):
+        "Returns the plugin information as a JSON serializable dict"
+        return {"name": self.name,
+                "baseurl": self.baseurl,
+                "plugin_type": self.plugin_type,
+                "author": self.author,
+                "description": self.description,
+                "version": self.version,
+                "plugin_dir": self.plugin_dir}
+
 
 class Fetch(object):
     "The base fetch class"
@@ -65,6 +77,9 @@ class Fetch(object):
         print("If installed or not")
         return
 
+    def installedPath(self, plugin):
+        return None
+
     def install(self, plugin):
         print("Installing")
         return
@@ -145,7 +160,7 @@ class FetchFromGitHub(Fetch):
 
             # ipdb.set_trace()
             # print("\nPlugins: ", self.instances)
-            return self.instances.values()
+            return list(self.instances.values())
 
         except gaierror or timeout:
             print("Please check your network connection!")
@@ -219,6 +234,14 @@ class FetchFromGitHub(Fetch):
         else:
             return False
 
+    def installedPath(self, plugin):
+        """Returns the directory of the installed workbench, else None.
+           Unlike isInstalled(), it doesn't change any state.
+        """
+        path = os.path.join(self.workbench_path, plugin.name)
+        if os.path.isdir(path):
+            return path
+
     def install(self, plugin):
         "Installs a GitHub plugin"
 
@@ -253,14 +276,15 @@ class FetchFromGitHub(Fetch):
             print("It is installed!")
             # Fetch information from the remote repository.
             self.repository.git.fetch()
-            # Gets the `git status` of the repository.
-            git_status = self.repository.git.status()
-            # Checks if the repository is up-to-date with remote.
-            if re.findall("clean", git_status) or re.findall("up-to-date", git_status):
+            # Counts the remote commits that aren't in the local branch.
+            # (`git status` says "working tree clean" even when behind.)
+            behind = int(self.repository.git.rev_list("--count",
+                                                      "HEAD..@{u}"))
+            if behind == 0:
                 print("Latest version already installed!")
                 return True
 
-            elif re.findall("behind", git_status) or re.findall("git pull", git_status):
+            else:
                 # New version available!
                 print("New version available!")
                 return False
@@ -469,6 +493,15 @@ class FetchFromWiki(Fetch):
             print("Plugin not installed.")
             return False
 
+    def installedPath(self, targetPlugin):
+        """Returns the file of the installed macro (any version), else None.
+           Unlike isInstalled(), it doesn't need the network.
+        """
+        exists = glob.glob(os.path.join(self.macro_path, targetPlugin.name)
+                           + "_*.FCMacro")
+        if exists:
+            return exists[0]
+
     def install(self, targetPlugin):
         "Installs the Macro"
 
@@ -501,7 +534,8 @@ class FetchFromWiki(Fetch):
 
         else:
             if not self.isInstalled(targetPlugin):
-                macro_file = open(self.install_dir, 'w+')
+                # Binary mode, as the code is written encoded (Python 3).
+                macro_file = open(self.install_dir, 'wb')
                 # ipdb.set_trace()
                 macro_file.write(macro_code.encode("utf8"))
                 macro_file.close()
@@ -530,7 +564,7 @@ class FetchFromWiki(Fetch):
                 print("Unexpectedly, couldn't get the plugin dir!")
             """
             # Compares local version with the remote version.
-            if self.installed_version is targetPlugin.version:
+            if self.installed_version == targetPlugin.version:
                 print("Latest version already installed!")
                 return True
 
@@ -558,42 +592,139 @@ class FetchFromWiki(Fetch):
         "Update a Macro plugin"
         if self.isUpToDate(targetPlugin) is False:
             print("Updating...")
-            backup_file = self.exists[0] + ".bak"
-            os.rename(self.exists[0], backup_file)
+            installed_file = self.exists[0]
+            backup_file = installed_file + ".bak"
+            os.rename(installed_file, backup_file)
             # Downloading the Macro again to update the plugin and remove
             # backup file.
             if self.install(targetPlugin) is True:
                 os.remove(backup_file)
-            print("Plugin successfully updated!")
-            return True
+                print("Plugin successfully updated!")
+                return True
+
+            # Restore the installed version if the download failed.
+            os.rename(backup_file, installed_file)
+            print("Update failed!")
+            return False
 
         else:
             print("Plugin already up-to-date.")
             return False
 
 
+# Maximum age of the cached catalog (in seconds) before it is fetched again.
+CATALOG_MAX_AGE = 24 * 60 * 60
+
+
 class PluginManager():
     "An interface to manage all plugins"
 
-    def __init__(self):
+    def __init__(self, use_cache=False, max_age=CATALOG_MAX_AGE,
+                 catalog=None):
+        """Fetches the catalog of plugins. If use_cache is True, then the
+           catalog saved by a previous fetch is used, unless it is older
+           than max_age seconds. catalog may also be given directly, as a
+           list of Plugin.toDict() (e.g. of another PluginManager).
+        """
         # ipdb.set_trace()
+
+        # Where the catalog, install manifest and hash cache are stored.
+        self.data_path = os.path.join(FreeCAD.ConfigGet("UserAppData"),
+                                      "PluginManager")
+        self.catalog = pluginIntegrity.JSONStore(
+            os.path.join(self.data_path, "catalog.json"))
+        self.manifest = pluginIntegrity.Manifest(
+            os.path.join(self.data_path, "manifest.json"))
+        self.hash_cache = pluginIntegrity.HashCache(
+            os.path.join(self.data_path, "hashcache.json"))
+
         gObj = FetchFromGitHub()
         mac = FetchFromWiki()
-        try:
-            self.totalPlugins = gObj.getPluginsList() + mac.getPluginsList()
 
-            """The blacklisted plugins are those that can not be installed.
-                And that do not contain code.
-            """
-            self.blacklisted_plugins_list = ["Macro BOLTS",
-                                             "Macro PartsLibrary",
-                                             "Macro FCGear",
-                                             "Macro WorkFeatures"]
+        """The blacklisted plugins are those that can not be installed.
+            And that do not contain code.
+        """
+        self.blacklisted_plugins_list = ["Macro BOLTS",
+                                         "Macro PartsLibrary",
+                                         "Macro FCGear",
+                                         "Macro WorkFeatures"]
+
+        # False if a source couldn't be reached (see below).
+        self.complete = True
+        # When the catalog was fetched, None if it was given.
+        self.fetch_time = None
+
+        if catalog is not None:
+            self.totalPlugins = self.loadCatalog(gObj, mac, catalog)
+            return
+
+        if use_cache and time.time() - self.catalog.data.get("time", 0) \
+                < max_age:
+            self.totalPlugins = self.loadCatalog(gObj, mac,
+                                                 self.catalog.data["plugins"])
+            self.fetch_time = self.catalog.data["time"]
+            print("Using the cached catalog.")
+            return
+
+        try:
+            self.fetch_time = time.time()
+            workbenches = gObj.getPluginsList()
+            macros = mac.getPluginsList()
+            self.totalPlugins = workbenches + macros
 
         except:
             print("Please check the connection!")
             exit()
 
+        # A source that couldn't be reached gives no plugins. Such a
+        # catalog isn't cached, the previous one is kept instead.
+        self.complete = bool(workbenches) and bool(macros)
+        if self.complete:
+            self.saveCatalog()
+        else:
+            print("Incomplete catalog, not saved!")
+
+    def loadCatalog(self, gObj, mac, catalog):
+        """Returns the plugins of the catalog (a list of Plugin.toDict()),
+           attached to their fetchers.
+        """
+        plugins = []
+        for info in catalog:
+            plugin = Plugin(info["name"], info["baseurl"],
+                            info["plugin_type"], info["author"],
+                            info["description"], info["version"])
+            if plugin.plugin_type == gObj.plugin_type:
+                plugin.fetch = gObj
+                gObj.instances[plugin.name] = plugin
+            else:
+                plugin.fetch = mac
+                mac.macro_instances.append(plugin)
+            plugins.append(plugin)
+        return plugins
+
+    def saveCatalog(self):
+        """Saves the catalog (with the additional information fetched so far)
+           for use_cache. It keeps the time the catalog was fetched at, so
+           saving it again doesn't make it any younger.
+        """
+        if not self.complete or self.fetch_time is None:
+            return
+
+        plugins = []
+        for plugin in self.totalPlugins:
+            info = plugin.toDict()
+            # The version is what isUpToDate() compares a macro with, so it
+            # is always fetched again rather than taken from the cache.
+            info["version"] = None
+            plugins.append(info)
+        self.catalog.set("time", self.fetch_time)
+        self.catalog.set("plugins", plugins)
+        try:
+            self.catalog.save()
+
+        except (IOError, OSError) as error:
+            print("Couldn't save the catalog!", error)
+
     def allPlugins(self):
         "Returns all of the available plugins"
         # ipdb.set_trace()
@@ -606,6 +737,31 @@ class PluginManager():
         # ipdb.set_trace()
         return self.totalPlugins
 
+    def getPlugin(self, name):
+        "Returns the plugin having the given name, else None"
+        for plugin in self.allPlugins():
+            if plugin.name == name:
+                return plugin
+
+    def search(self, keyword):
+        """Returns the plugins whose name (or already fetched description)
+           contains the keyword. The search is case-insensitive.
+        """
+        keyword = keyword.lower()
+        matches = []
+        for plugin in self.allPlugins():
+            text = plugin.name + " " + (plugin.description or "")
+            if keyword in text.lower():
+                matches.append(plugin)
+        return matches
+
+    def installedPlugins(self):
+        """Returns the plugins that are installed, found without using the
+           network (so a macro installed under any version counts).
+        """
+        return [plugin for plugin in self.allPlugins()
+                if plugin.fetch.installedPath(plugin) is not None]
+
     def info(self, targetPlugin):
         "Get additional information about a plugin"
         # ipdb.set_trace()
@@ -622,10 +778,15 @@ class PluginManager():
         if targetPlugin in self.totalPlugins:
             return targetPlugin.fetch.isInstalled(targetPlugin)
 
-    def install(self, targetPlugin):
-        "Install a plugin"
+    def install(self, targetPlugin, record=True):
+        """Install a plugin. If record is False, recordManifest() is left to
+           the caller.
+        """
         if targetPlugin in self.totalPlugins:
-            return targetPlugin.fetch.install(targetPlugin)
+            installed = targetPlugin.fetch.install(targetPlugin)
+            if installed is True and record:
+                self.recordManifest(targetPlugin)
+            return installed
 
     def isUpToDate(self, targetPlugin):
         "Checks if the plugin is up to date"
@@ -635,9 +796,132 @@ class PluginManager():
     def uninstall(self, targetPlugin):
         "Uninstall a plugin"
         if targetPlugin in self.totalPlugins:
-            return targetPlugin.fetch.uninstall(targetPlugin)
-
-    def update(self, targetPlugin):
-        "Update a plugin"
+            uninstalled = targetPlugin.fetch.uninstall(targetPlugin)
+            entry = self.manifest.data.get(targetPlugin.name)
+            if uninstalled is True and entry is not None:
+                self.manifest.remove(targetPlugin.name)
+                self.manifest.save()
+                self.hash_cache.prune(entry["path"], [])
+                self.hash_cache.save()
+            return uninstalled
+
+    def update(self, targetPlugin, record=True):
+        """Update a plugin. If record is False, recordManifest() is left to
+           the caller.
+        """
         if targetPlugin in self.totalPlugins:
-            return targetPlugin.fetch.update(targetPlugin)
+            updated = targetPlugin.fetch.update(targetPlugin)
+            if updated is True and record:
+                # The plugin_dir of a GitHub workbench stays the same, while
+                # the one of a macro is set again by the install.
+                self.recordManifest(targetPlugin)
+            return updated
+
+    def recordManifest(self, targetPlugin):
+        """Records the hashes of the installed plugin files, to be checked
+           later by verify().
+        """
+        try:
+            self.manifest.record(targetPlugin, self.hash_cache)
+
+        except (IOError, OSError) as error:
+            print("Couldn't record the manifest of", targetPlugin, error)
+
+        else:
+            self.manifest.save()
+            self.hash_cache.save()
+
+    def verify(self, targetPlugins=None, record=False):
+        """Checks if the installed plugins still match what was installed.
+           Checks the plugins recorded in the manifest and the installed
+           ones, or the given ones. If record is True, the installed plugins
+           missing from the manifest are recorded as they are now.
+
+           Returns a list of dicts, one per plugin, with its "status" (ok,
+           modified, missing, unrecorded, recorded or not installed), the
+           "modified", "missing" and "added" files compared to the manifest
+           and, for workbenches, the "upstream" files that differ from the
+           cloned commit.
+        """
+        if targetPlugins is None:
+            names = set(self.manifest.data)
+            names.update(plugin.name for plugin in self.installedPlugins())
+            names = sorted(names)
+        else:
+            names = [plugin.name for plugin in targetPlugins]
+
+        # The recorded path, else the one of the installed plugin.
+        roots = {}
+        for name in names:
+            entry = self.manifest.data.get(name)
+            plugin = self.getPlugin(name)
+            if entry is not None:
+                roots[name] = entry["path"]
+            elif plugin is not None:
+                roots[name] = plugin.fetch.installedPath(plugin)
+
+        # Lists the files of every plugin first, so that all of them are
+        # hashed in a single (parallel) batch.
+        plugin_files = {}
+        for name, root in roots.items():
+            if root is not None and os.path.exists(root):
+                plugin_files[name] = (root, pluginIntegrity.listFiles(root))
+
+        paths = [pluginIntegrity.absolutePath(root, f)
+                 for root, files in plugin_files.values() for f in files]
+        hashes = self.hash_cache.hashes(paths)
+        # Forget the hashes of the files that don't exist anymore.
+        for name, root in roots.items():
+            if root is not None:
+                files = plugin_files.get(name, (root, []))[1]
+                self.hash_cache.prune(
+                    root, [pluginIntegrity.absolutePath(root, f)
+                           for f in files])
+        self.hash_cache.save()
+
+        results = []
+        for name in names:
+            entry = self.manifest.data.get(name)
+            result = {"name": name, "path": roots.get(name), "modified": [],
+                      "missing": [], "added": [], "upstream": None}
+            results.append(result)
+
+            if name not in plugin_files:
+                if entry is None:
+                    result["status"] = "not installed"
+                else:
+                    result["status"] = "missing"
+                    result["missing"] = sorted(entry["files"])
+                continue
+
+            root, files = plugin_files[name]
+            actual = dict((f, hashes[pluginIntegrity.absolutePath(root, f)])
+                          for f in files)
+            if entry is not None:
+                result["modified"], result["missing"], result["added"] = \
+                    pluginIntegrity.compare(entry["files"], actual)
+
+            # Compare with the upstream checksums, where they exist. Files
+            # not tracked upstream (e.g. compiled ones) aren't reported.
+            upstream = pluginIntegrity.upstreamHashes(root)
+            if upstream is not None:
+                modified, missing, added = pluginIntegrity.compare(upstream,
+                                                                   actual)
+                result["upstream"] = modified + missing
+
+            if entry is None:
+                if record:
+                    self.manifest.record(self.getPlugin(name),
+                                         self.hash_cache, root)
+                    result["status"] = "recorded"
+                else:
+                    result["status"] = "unrecorded"
+            elif result["modified"] or result["missing"] or \
+                    result["added"] or result["upstream"]:
+                result["status"] = "modified"
+            else:
+                result["status"] = "ok"
+
+        if record:
+            self.manifest.save()
+        return results
@@ -0,0 +1,410 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+
+* File Name : pluginManagerCLI.py
+
+* Purpose : Command-line interface of the PluginManager.
+
+* Creation Date : 19-10-2026
+
+* Copyright (c) 2016 Mandeep Singh <mandeeps708@gmail.com>
+
+"""
+
+from __future__ import print_function
+import os
+import sys
+import json
+import time
+import socket
+import argparse
+import threading
+from multiprocessing.pool import ThreadPool
+
+"""Usage examples:
+
+    $ python pluginManagerCLI.py list
+    $ python pluginManagerCLI.py --json info "Macro Foo" Bar
+    $ python pluginManagerCLI.py --ndjson -j 8 install "Macro Foo" Bar
+    $ python pluginManagerCLI.py sync --update plugins.txt
+
+The catalog saved by the last fetch is used (see PluginManager(use_cache)),
+and list/search/info are answered by a running pluginService if there is one.
+So starting the CLI doesn't need the network. The library messages are
+written to stderr (or dropped with --quiet), so that stdout only has the
+output of the command.
+"""
+
+# The commands that change the installed plugins.
+ACTIONS = ("install", "update", "uninstall")
+
+# The verify statuses that aren't a failure.
+VERIFY_OK = ("ok", "unrecorded", "recorded")
+
+
+def errorMessage(error):
+    "Returns the message of an exception caught by the CLI"
+    # PluginManager() calls exit() if the catalog couldn't be fetched.
+    if isinstance(error, SystemExit) and error.code is None:
+        return "Couldn't fetch the plugin catalog"
+    return str(error) or error.__class__.__name__
+
+
+class Runner(object):
+    """Runs the commands. Each worker thread gets its own PluginManager (built
+       from the catalog of the main one), as the fetchers aren't thread-safe.
+       The manifest and hash cache are shared between them.
+    """
+
+    def __init__(self, args, factory=None):
+        "factory creates the PluginManager, PluginManager by default"
+        self.args = args
+        self.factory = factory
+        self.local = threading.local()
+        self.lock = threading.Lock()
+        self.main_manager = None
+        self.catalog = None
+        # The plugins installed or updated by the worker threads. Their
+        # manifests are recorded by the main thread, as hashing may fork
+        # processes, which isn't safe from a multi-threaded process.
+        self.to_record = []
+
+    def manager(self):
+        "Returns the PluginManager of the current thread"
+        if not hasattr(self.local, "manager"):
+            factory = self.factory
+            if factory is None:
+                from pluginManager import PluginManager as factory
+
+            with self.lock:
+                if self.main_manager is None:
+                    self.main_manager = factory(
+                        use_cache=not self.args.refresh,
+                        max_age=self.args.max_age)
+                    self.catalog = [plugin.toDict() for plugin in
+                                    self.main_manager.allPlugins()]
+                    manager = self.main_manager
+                else:
+                    manager = factory(catalog=self.catalog)
+                    manager.manifest = self.main_manager.manifest
+                    manager.hash_cache = self.main_manager.hash_cache
+            self.local.manager = manager
+        return self.local.manager
+
+    def client(self):
+        "Returns a client of the running service, or None"
+        # There are no Unix sockets on Windows.
+        if self.args.no_service or not hasattr(socket, "AF_UNIX"):
+            return None
+
+        from pluginService import PluginClient
+        try:
+            return PluginClient(self.args.socket, timeout=self.args.timeout)
+        except (IOError, OSError):
+            return None
+
+    def plugin(self, name):
+        plugin = self.manager().getPlugin(name)
+        if plugin is None:
+            raise ValueError("Unknown plugin: %s" % name)
+        return plugin
+
+    def timed(self, function, name):
+        "Returns the result record of function(name), with its timing"
+        start = time.time()
+        result = {"name": name, "ok": True}
+        try:
+            result["result"] = function(name)
+        except (Exception, SystemExit) as error:
+            result["ok"] = False
+            result["error"] = errorMessage(error)
+        result["elapsed"] = round(time.time() - start, 3)
+        return result
+
+    def run(self, function, names):
+        """Calls function(name) for every name in parallel and yields the
+           results as they complete.
+        """
+        def timed(name):
+            return self.timed(function, name)
+
+        # Builds the main manager once, before starting the threads. If the
+        # catalog can't be fetched, the command fails as a whole.
+        self.manager()
+        if len(names) < 2 or self.args.jobs < 2:
+            for name in names:
+                yield timed(name)
+            return
+
+        pool = ThreadPool(min(self.args.jobs, len(names)))
+        try:
+            for result in pool.imap_unordered(timed, names):
+                yield result
+        finally:
+            pool.close()
+            pool.join()
+
+    def list(self):
+        client = self.client()
+        if client is not None:
+            with client:
+                return client.allPlugins()
+        return [plugin.toDict() for plugin in self.manager().allPlugins()]
+
+    def search(self):
+        client = self.client()
+        if client is not None:
+            with client:
+                return client.search(self.args.keyword)
+        return [plugin.toDict() for plugin in
+                self.manager().search(self.args.keyword)]
+
+    def info(self):
+        client = self.client()
+        if client is not None:
+            # A client is a single connection, so the queries are sequential.
+            with client:
+                return [self.timed(client.info, name)
+                        for name in self.args.names]
+
+        def info(name):
+            return self.manager().info(self.plugin(name)).toDict()
+
+        results = list(self.run(info, self.args.names))
+        if self.main_manager is None:
+            return results
+
+        # Keep the fetched information (possibly fetched by other threads)
+        # in the catalog for the next runs.
+        for result in results:
+            if result["ok"]:
+                plugin = self.main_manager.getPlugin(result["name"])
+                plugin.author = result["result"]["author"]
+                plugin.description = result["result"]["description"]
+                plugin.version = result["result"]["version"]
+        self.main_manager.saveCatalog()
+        return results
+
+    def recordManifests(self, records):
+        """Yields the records, then records the manifests of the plugins
+           changed by the (by then finished) worker threads.
+        """
+        for record in records:
+            yield record
+        for plugin in self.to_record:
+            self.main_manager.recordManifest(plugin)
+
+    def action(self):
+        command = self.args.command
+
+        def action(name):
+            manager = self.manager()
+            plugin = self.plugin(name)
+            if command == "uninstall":
+                return manager.uninstall(plugin)
+
+            result = getattr(manager, command)(plugin, record=False)
+            if result is True:
+                self.to_record.append(plugin)
+            return result
+
+        return self.recordManifests(self.run(action, self.args.names))
+
+    def outdated(self):
+        names = self.args.names
+        if not names:
+            # Only check the installed plugins, i.e. the recorded ones and
+            # the ones found in the Mod and Macro directories.
+            manager = self.manager()
+            names = set(manager.manifest.data)
+            names.update(plugin.name for plugin in manager.installedPlugins())
+            names = sorted(names)
+
+        def outdated(name):
+            # None if not installed.
+            upToDate = self.manager().isUpToDate(self.plugin(name))
+            if upToDate is not None:
+                return not upToDate
+
+        return self.run(outdated, names)
+
+    def sync(self):
+        "Installs the plugins listed in the manifest file (and updates them)"
+        try:
+            with open(self.args.manifest) as f:
+                names = [line.strip() for line in f]
+        except (IOError, OSError) as error:
+            raise SystemExit("Couldn't read the manifest: %s" % error)
+        # Skip the empty lines and comments.
+        names = [name for name in names if name and not name.startswith("#")]
+
+        def sync(name):
+            manager = self.manager()
+            plugin = self.plugin(name)
+            if not manager.isInstalled(plugin):
+                if manager.install(plugin, record=False) is not True:
+                    raise RuntimeError("Installation failed")
+                self.to_record.append(plugin)
+                return "installed"
+            elif self.args.update and \
+                    manager.update(plugin, record=False) is True:
+                self.to_record.append(plugin)
+                return "updated"
+            return "unchanged"
+
+        return self.recordManifests(self.run(sync, names))
+
+    def verify(self):
+        names = self.args.names
+        manager = self.manager()
+        plugins = [self.plugin(name) for name in names] if names else None
+        results = manager.verify(plugins, record=self.args.record)
+        for result in results:
+            result["ok"] = result["status"] in VERIFY_OK
+        return results
+
+
+def formatText(command, record):
+    "Returns the human readable line of a record"
+    if command in ("list", "search"):
+        return "%-40s %s" % (record["name"], record["plugin_type"])
+
+    elif command == "verify":
+        changes = record["modified"] + record["missing"] + record["added"]
+        # The files differing from the upstream commit only.
+        changes += [f for f in record.get("upstream") or []
+                    if f not in changes]
+        return "%s: %s %s" % (record["name"], record["status"],
+                              " ".join(changes))
+
+    elif not record["ok"]:
+        return "%s: failed (%s)" % (record["name"], record["error"])
+
+    result = record["result"]
+    if command == "info":
+        result = "\n  ".join("%s: %s" % (key, result[key]) for key in
+                             ("plugin_type", "author", "version",
+                              "description", "baseurl"))
+    elif command == "outdated":
+        result = {True: "outdated", False: "up-to-date",
+                  None: "not installed"}[result]
+    return "%s: %s (%.2fs)" % (record["name"], result, record["elapsed"])
+
+
+def parseArgs(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="pluginmanager", description="Manage the FreeCAD plugins")
+
+    output = parser.add_mutually_exclusive_group()
+    output.add_argument("--json", dest="output", action="store_const",
+                        const="json", help="print a single JSON document")
+    output.add_argument("--ndjson", dest="output", action="store_const",
+                        const="ndjson", help="print one JSON object per line")
+    parser.add_argument("-j", "--jobs", type=int, default=4,
+                        help="number of plugins processed in parallel")
+    parser.add_argument("-q", "--quiet", action="store_true",
+                        help="drop the library messages")
+    parser.add_argument("--refresh", action="store_true",
+                        help="fetch the catalog instead of using the cache")
+    parser.add_argument("--max-age", type=float, default=24 * 60 * 60,
+                        help="maximum age of the cached catalog (seconds)")
+    parser.add_argument("--no-service", action="store_true",
+                        help="don't query a running pluginService")
+    parser.add_argument("--socket", help="socket path of the pluginService")
+    parser.add_argument("--timeout", type=float, default=30,
+                        help="timeout of the pluginService queries")
+
+    commands = parser.add_subparsers(dest="command")
+    commands.required = True
+    commands.add_parser("list", help="list the available plugins")
+    search = commands.add_parser("search", help="search the plugins")
+    search.add_argument("keyword")
+    for command, help in (("info", "additional information about plugins"),
+                          ("install", "install plugins"),
+                          ("update", "update plugins"),
+                          ("uninstall", "uninstall plugins")):
+        commands.add_parser(command, help=help).add_argument("names",
+                                                             nargs="+")
+    commands.add_parser("outdated", help="check if plugins are outdated "
+                        "(all the installed ones by default)").add_argument(
+                            "names", nargs="*")
+    sync = commands.add_parser("sync", help="install the plugins listed in a "
+                               "file, one name per line")
+    sync.add_argument("manifest")
+    sync.add_argument("--update", action="store_true",
+                      help="also update the installed plugins")
+    verify = commands.add_parser("verify", help="check the installed plugins "
+                                 "for changes")
+    verify.add_argument("names", nargs="*")
+    verify.add_argument("--record", action="store_true",
+                        help="record the installed plugins missing from the "
+                        "manifest")
+
+    args = parser.parse_args(argv)
+    if args.refresh:
+        # A running service has its own catalog.
+        args.no_service = True
+    return args
+
+
+def main(argv=None, factory=None):
+    """Runs the command line and returns the exit status: 0 if everything
+       succeeded, else 1.
+    """
+    args = parseArgs(argv)
+    start = time.time()
+
+    # The library prints its progress to stdout, keep that for the output.
+    stdout = sys.stdout
+    sys.stdout = open(os.devnull, "w") if args.quiet else sys.stderr
+
+    runner = Runner(args, factory)
+    ok = True
+    error = None
+    collected = []
+    try:
+        if args.command in ACTIONS:
+            records = runner.action()
+        else:
+            records = getattr(runner, args.command)()
+
+        for record in records:
+            ok = ok and record.get("ok", True)
+            if args.output == "ndjson":
+                stdout.write(json.dumps(record) + "\n")
+                stdout.flush()
+            elif args.output == "json":
+                collected.append(record)
+            else:
+                stdout.write(formatText(args.command, record) + "\n")
+
+    # E.g. the catalog couldn't be fetched, or an unknown plugin to verify.
+    except (Exception, SystemExit) as exception:
+        ok = False
+        error = errorMessage(exception)
+
+    finally:
+        sys.stdout = stdout
+
+    if args.output == "json":
+        document = {"command": args.command, "ok": ok,
+                    "elapsed": round(time.time() - start, 3),
+                    "results": collected}
+        if error is not None:
+            document["error"] = error
+        json.dump(document, stdout, indent=2)
+        stdout.write("\n")
+
+    elif error is not None:
+        if args.output == "ndjson":
+            stdout.write(json.dumps({"ok": False, "error": error}) + "\n")
+        else:
+            sys.stderr.write("pluginmanager: error: %s\n" % error)
+
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
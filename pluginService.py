@@ -0,0 +1,380 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+
+* File Name : pluginService.py
+
+* Purpose : Long-lived service keeping the PluginManager catalog in memory
+            and answering queries over a Unix socket.
+
+* Creation Date : 19-10-2026
+
+* Copyright (c) 2016 Mandeep Singh <mandeeps708@gmail.com>
+
+"""
+
+from __future__ import print_function
+import os
+import copy
+import json
+import time
+import errno
+import socket
+import tempfile
+import threading
+try:
+    import socketserver
+except ImportError:
+    # Python 2.
+    import SocketServer as socketserver
+
+"""The protocol is line based: a client sends one JSON object per line like
+{"cmd": "info", "name": "Macro Foo"} and gets back one JSON object per line,
+either {"ok": true, "result": ...} or {"ok": false, "error": "..."}.
+"""
+
+# Default refresh interval of the catalog (in seconds).
+REFRESH_INTERVAL = 6 * 60 * 60
+
+# How long the isInstalled/isUpToDate answers are cached (in seconds).
+STATE_TTL = 5 * 60
+
+# How long the additional information of a plugin (author, version etc.) is
+# carried over refreshes before being fetched again (in seconds).
+INFO_MAX_AGE = REFRESH_INTERVAL
+
+SOCKET_NAME = "freecad-pluginmanager.sock"
+
+
+def socketDirectory(create=False):
+    """Returns the directory of the service socket, only readable by the
+       current user: $XDG_RUNTIME_DIR, else a private directory in the
+       temporary directory.
+    """
+    if os.environ.get("XDG_RUNTIME_DIR"):
+        return os.environ["XDG_RUNTIME_DIR"]
+
+    directory = os.path.join(tempfile.gettempdir(),
+                             "freecad-pluginmanager-%d" % os.getuid())
+    if create and not os.path.exists(directory):
+        os.mkdir(directory, 0o700)
+
+    # Another user could have created it first, to answer the queries.
+    if os.path.exists(directory):
+        stat = os.stat(directory)
+        if stat.st_uid != os.getuid() or stat.st_mode & 0o077:
+            raise OSError("Unsafe socket directory: %s" % directory)
+    return directory
+
+
+def defaultSocketPath(create=False):
+    "Returns the default path of the service socket for the current user"
+    return os.path.join(socketDirectory(create), SOCKET_NAME)
+
+
+def stateSignature(plugin):
+    """Returns the modification times of the paths that installing,
+       updating or uninstalling the plugin changes.
+    """
+    fetch = plugin.fetch
+    if plugin.plugin_type == "Workbench":
+        plugin_dir = os.path.join(fetch.workbench_path, plugin.name)
+        paths = [fetch.workbench_path, plugin_dir,
+                 os.path.join(plugin_dir, ".git")]
+    else:
+        paths = [fetch.macro_path]
+
+    mtimes = []
+    for path in paths:
+        try:
+            mtimes.append(os.stat(path).st_mtime)
+        except OSError:
+            mtimes.append(None)
+    return mtimes
+
+
+class PluginService(object):
+    "Keeps a PluginManager hot in memory and refreshes it on a schedule"
+
+    def __init__(self, interval=REFRESH_INTERVAL, factory=None,
+                 info_max_age=INFO_MAX_AGE):
+        """factory creates the PluginManager, PluginManager by default.
+           Raises RuntimeError if the (complete) catalog couldn't be
+           fetched.
+        """
+        if factory is None:
+            from pluginManager import PluginManager as factory
+        self.factory = factory
+        self.interval = interval
+        self.info_max_age = info_max_age
+        self.manager = None
+        # When the additional information of each plugin was fetched.
+        self.info_times = {}
+        # Per-plugin cache of isInstalled/isUpToDate results, with the time
+        # and the stateSignature() they were computed at. It is reset on
+        # every refresh of the catalog.
+        self.state = {}
+        # Guards self.manager and self.state. It isn't held during the
+        # network calls (see call()).
+        self.lock = threading.RLock()
+        # Per-plugin locks, so the same plugin isn't queried twice at once.
+        self.plugin_locks = {}
+        self.stopped = threading.Event()
+        if not self.refresh():
+            raise RuntimeError("Couldn't fetch the catalog!")
+
+    def refresh(self):
+        """Fetches the catalog again and swaps it in. The old catalog is
+           kept if the fetch fails.
+        """
+        print("Refreshing the catalog...")
+        try:
+            manager = self.factory()
+        # PluginManager() exits if the catalog couldn't be fetched.
+        except SystemExit:
+            print("Catalog refresh failed! Keeping the old one.")
+            return False
+
+        # A source (GitHub or the wiki) couldn't be reached.
+        if not manager.complete:
+            print("Incomplete catalog! Keeping the old one.")
+            return False
+
+        # Drops the blacklisted plugins once, so later list/search queries
+        # only read the catalog and don't need the lock.
+        plugins = manager.allPlugins()
+
+        with self.lock:
+            if self.manager is not None:
+                # Carry over the additional information fetched less than
+                # info_max_age ago. The older one (e.g. the version of a
+                # macro) is fetched again when needed.
+                now = time.time()
+                old_plugins = dict((plugin.name, plugin) for plugin in
+                                   self.manager.allPlugins())
+                info_times = {}
+                for plugin in plugins:
+                    old = old_plugins.get(plugin.name)
+                    fetched = self.info_times.get(plugin.name)
+                    if old is not None and plugin.author is None and \
+                            fetched is not None and \
+                            now - fetched < self.info_max_age:
+                        plugin.author = old.author
+                        plugin.description = old.description
+                        plugin.version = old.version
+                        info_times[plugin.name] = fetched
+                self.info_times = info_times
+            self.manager = manager
+            self.state = {}
+        return True
+
+    def run(self):
+        "Refreshes the catalog every self.interval seconds until stopped"
+        while not self.stopped.wait(self.interval):
+            self.refresh()
+
+    def start(self):
+        "Starts the refresh loop in a background thread"
+        thread = threading.Thread(target=self.run)
+        thread.daemon = True
+        thread.start()
+        return thread
+
+    def stop(self):
+        self.stopped.set()
+
+    def getPlugin(self, name):
+        "Returns the plugin with the given name or raises ValueError"
+        plugin = self.manager.getPlugin(name)
+        if plugin is None:
+            raise ValueError("Unknown plugin: %s" % name)
+        return plugin
+
+    def pluginLock(self, name):
+        with self.lock:
+            return self.plugin_locks.setdefault(name, threading.Lock())
+
+    def call(self, name, method):
+        """Calls the fetcher method for the plugin. The fetch classes keep
+           per-call state (install_dir etc.), so every call gets its own
+           copy of the fetcher and the service lock isn't needed.
+        """
+        plugin = self.getPlugin(name)
+        had_info = plugin.author is not None
+        result = getattr(copy.copy(plugin.fetch), method)(plugin)
+        # getInfo() is also called by isInstalled() etc.
+        if not had_info and plugin.author is not None:
+            with self.lock:
+                self.info_times[name] = time.time()
+        return result
+
+    def cachedState(self, name, method):
+        """Returns the cached result of the fetcher method for the plugin.
+           It is computed again after STATE_TTL seconds, or as soon as the
+           plugin is installed, updated or uninstalled by anyone else.
+        """
+        with self.pluginLock(name):
+            with self.lock:
+                plugin = self.getPlugin(name)
+                cached = self.state.get(name, {}).get(method)
+            if cached is not None:
+                computed, signature, result = cached
+                if time.time() - computed < STATE_TTL and \
+                        signature == stateSignature(plugin):
+                    return result
+
+            result = self.call(name, method)
+            # The signature is taken after the call, as "git fetch" changes
+            # the .git directory too.
+            with self.lock:
+                self.state.setdefault(name, {})[method] = (
+                    time.time(), stateSignature(plugin), result)
+            return result
+
+    def query(self, request):
+        "Answers a single decoded request"
+        cmd = request.get("cmd")
+        name = request.get("name")
+
+        if cmd == "ping":
+            return "pong"
+
+        elif cmd == "list":
+            return [plugin.toDict() for plugin in self.manager.allPlugins()]
+
+        elif cmd == "search":
+            return [plugin.toDict() for plugin in
+                    self.manager.search(request.get("keyword", ""))]
+
+        elif cmd == "info":
+            with self.pluginLock(name):
+                return self.call(name, "getInfo").toDict()
+
+        elif cmd in ("isInstalled", "isUpToDate"):
+            return self.cachedState(name, cmd)
+
+        elif cmd == "refresh":
+            return self.refresh()
+
+        else:
+            raise ValueError("Unknown command: %s" % cmd)
+
+    def serve(self, path=None):
+        """Serves queries on the Unix socket path until interrupted. Raises
+           RuntimeError if another service is already listening there.
+        """
+        if not hasattr(socket, "AF_UNIX"):
+            raise RuntimeError("Unix sockets aren't available on this "
+                               "platform!")
+
+        path = path or defaultSocketPath(create=True)
+        if os.path.exists(path):
+            probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            try:
+                probe.connect(path)
+            except socket.error as error:
+                if error.errno != errno.ECONNREFUSED:
+                    raise
+                # Remove the stale socket left by a previous run.
+                os.remove(path)
+            else:
+                raise RuntimeError("A service is already running on %s"
+                                   % path)
+            finally:
+                probe.close()
+
+        service = self
+
+        class Handler(socketserver.StreamRequestHandler):
+
+            def handle(self):
+                for line in self.rfile:
+                    try:
+                        result = service.query(json.loads(line.decode("utf8")))
+                        response = {"ok": True, "result": result}
+                    except Exception as error:
+                        response = {"ok": False, "error": str(error)}
+                    self.wfile.write((json.dumps(response, separators=(",", ":"))
+                                      + "\n").encode("utf8"))
+                    self.wfile.flush()
+
+        class Server(socketserver.ThreadingMixIn,
+                     socketserver.UnixStreamServer):
+            daemon_threads = True
+
+        server = Server(path, Handler)
+        self.start()
+        print("Serving on", path)
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            print("\nInterrupted by Keyboard!")
+        finally:
+            self.stop()
+            server.server_close()
+            os.remove(path)
+
+
+class PluginClient(object):
+    """Client of a running PluginService. It doesn't import FreeCAD or the
+       PluginManager, so it is cheap to create.
+    """
+
+    def __init__(self, path=None, timeout=None):
+        """Connects to the service. Raises socket.error (an IOError) if no
+           service is running, or if Unix sockets aren't available.
+        """
+        if not hasattr(socket, "AF_UNIX"):
+            raise socket.error("Unix sockets aren't available on this "
+                               "platform!")
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(timeout)
+        self.sock.connect(path or defaultSocketPath())
+        self.stream = self.sock.makefile("rwb")
+
+    def close(self):
+        self.stream.close()
+        self.sock.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def query(self, cmd, **kwargs):
+        "Sends a request and returns its result, raising on errors"
+        kwargs["cmd"] = cmd
+        self.stream.write((json.dumps(kwargs) + "\n").encode("utf8"))
+        self.stream.flush()
+        response = json.loads(self.stream.readline().decode("utf8"))
+        if not response["ok"]:
+            raise RuntimeError(response["error"])
+        return response["result"]
+
+    def allPlugins(self):
+        return self.query("list")
+
+    def search(self, keyword):
+        return self.query("search", keyword=keyword)
+
+    def info(self, name):
+        return self.query("info", name=name)
+
+    def isInstalled(self, name):
+        return self.query("isInstalled", name=name)
+
+    def isUpToDate(self, name):
+        return self.query("isUpToDate", name=name)
+
+    def refresh(self):
+        return self.query("refresh")
+
+
+if __name__ == "__main__":
+    try:
+        PluginService().serve()
+    except RuntimeError as error:
+        print(error)
+        exit(1)
@@ -0,0 +1,21 @@
+import os
+import sys
+import types
+
+# The modules live at the top of the repository, like getPlugins.py uses them.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+class _Parameters(object):
+
+    def GetString(self, name):
+        return ""
+
+
+# A stub of the FreeCAD module, so that pluginManager can be imported. Tests
+# point user_app_data to a temporary directory.
+FreeCAD = types.ModuleType("FreeCAD")
+FreeCAD.user_app_data = None
+FreeCAD.ConfigGet = lambda name: FreeCAD.user_app_data
+FreeCAD.ParamGet = lambda path: _Parameters()
+sys.modules["FreeCAD"] = FreeCAD
@@ -0,0 +1,152 @@
+import os
+import time
+import shutil
+import tempfile
+import unittest
+
+import pluginIntegrity
+from pluginIntegrity import HashCache, Manifest
+
+
+class FakePlugin(object):
+
+    def __init__(self, name, plugin_dir):
+        self.name = name
+        self.plugin_dir = plugin_dir
+
+
+class PluginIntegrityTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.workbench = os.path.join(self.directory, "Mod", "sheetmetal")
+        os.makedirs(os.path.join(self.workbench, "sub"))
+        os.makedirs(os.path.join(self.workbench, ".git"))
+        self.write("a.py", "print('a')\n")
+        self.write("sub/empty", "")
+        self.write(".git/HEAD", "ref: refs/heads/master\n")
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def write(self, relpath, content):
+        with open(os.path.join(self.workbench, relpath), "w") as f:
+            f.write(content)
+
+    def test_hash_file_is_the_git_blob_hash(self):
+        self.assertEqual(pluginIntegrity.hashFile(
+            os.path.join(self.workbench, "sub/empty")),
+            "e69de29bb2d1d6434b8b29ae775ad8c2e48c5391")
+        self.write("a.py", "a\n")
+        self.assertEqual(pluginIntegrity.hashFile(
+            os.path.join(self.workbench, "a.py")),
+            "78981922613b2afb6025042ff6bd878ac1994e85")
+
+    def test_hash_files_in_a_pool(self):
+        paths = []
+        for index in range(pluginIntegrity.POOL_THRESHOLD):
+            self.write("sub/f%d" % index, str(index))
+            paths.append(os.path.join(self.workbench, "sub/f%d" % index))
+        hashes = pluginIntegrity.hashFiles(paths)
+        self.assertEqual(hashes, dict((path, pluginIntegrity.hashFile(path))
+                                      for path in paths))
+
+    def test_list_files_skips_git(self):
+        self.assertEqual(sorted(pluginIntegrity.listFiles(self.workbench)),
+                         ["a.py", "sub/empty"])
+
+    def test_compare(self):
+        expected = {"a": "1", "b": "2", "c": "3"}
+        actual = {"a": "1", "b": "x", "d": "4"}
+        self.assertEqual(pluginIntegrity.compare(expected, actual),
+                         (["b"], ["c"], ["d"]))
+        self.assertEqual(pluginIntegrity.compare(expected, expected),
+                         ([], [], []))
+
+    def test_hash_cache_only_rehashes_changed_files(self):
+        hashed = []
+        hashFiles = pluginIntegrity.hashFiles
+
+        def recordingHashFiles(paths):
+            hashed.extend(paths)
+            return hashFiles(paths)
+
+        pluginIntegrity.hashFiles = recordingHashFiles
+        try:
+            path = os.path.join(self.directory, "cache.json")
+            a_path = os.path.join(self.workbench, "a.py")
+            empty_path = os.path.join(self.workbench, "sub/empty")
+            cache = HashCache(path)
+            first = cache.hashes([a_path, empty_path])
+            cache.save()
+            self.assertEqual(len(hashed), 2)
+
+            # A new cache loads the saved hashes.
+            del hashed[:]
+            cache = HashCache(path)
+            self.assertEqual(cache.hashes([a_path, empty_path]), first)
+            self.assertEqual(hashed, [])
+
+            # Changing the size (or mtime) of a file invalidates its hash.
+            time.sleep(0.01)
+            self.write("a.py", "print('changed')\n")
+            second = cache.hashes([a_path, empty_path])
+            self.assertEqual(hashed, [a_path])
+            self.assertNotEqual(second[a_path], first[a_path])
+            self.assertEqual(second[empty_path], first[empty_path])
+        finally:
+            pluginIntegrity.hashFiles = hashFiles
+
+    def test_manifest(self):
+        cache = HashCache(os.path.join(self.directory, "cache.json"))
+        manifest = Manifest(os.path.join(self.directory, "manifest.json"))
+        manifest.record(FakePlugin("sheetmetal", self.workbench), cache)
+        manifest.save()
+
+        entry = Manifest(manifest.path).data["sheetmetal"]
+        self.assertEqual(entry["path"], self.workbench)
+        self.assertEqual(sorted(entry["files"]), ["a.py", "sub/empty"])
+
+        manifest.remove("sheetmetal")
+        manifest.save()
+        self.assertEqual(Manifest(manifest.path).data, {})
+
+    def test_concurrent_saves_are_merged(self):
+        cache = HashCache(os.path.join(self.directory, "cache.json"))
+        path = os.path.join(self.directory, "manifest.json")
+        macro = os.path.join(self.directory, "Macro Screw_1.0.FCMacro")
+        with open(macro, "w") as f:
+            f.write("print('screw')\n")
+
+        # Two runs load the manifest at the same time.
+        first, second = Manifest(path), Manifest(path)
+        first.record(FakePlugin("sheetmetal", self.workbench), cache)
+        second.record(FakePlugin("Macro Screw", macro), cache)
+        first.save()
+        second.save()
+        self.assertEqual(sorted(Manifest(path).data),
+                         ["Macro Screw", "sheetmetal"])
+
+        first.remove("sheetmetal")
+        first.save()
+        self.assertEqual(sorted(Manifest(path).data), ["Macro Screw"])
+
+    def test_hash_cache_prunes_deleted_files(self):
+        cache = HashCache(os.path.join(self.directory, "cache.json"))
+        manifest = Manifest(os.path.join(self.directory, "manifest.json"))
+        plugin = FakePlugin("sheetmetal", self.workbench)
+        manifest.record(plugin, cache)
+        a_path = os.path.join(self.workbench, "a.py")
+        self.assertIn(a_path, cache.data)
+
+        os.remove(a_path)
+        manifest.record(plugin, cache)
+        self.assertNotIn(a_path, cache.data)
+        self.assertIn(os.path.join(self.workbench, "sub/empty"), cache.data)
+
+        cache.prune(self.workbench, [])
+        self.assertEqual(cache.data, {})
+
+
+if __name__ == "__main__":
+    unittest.main()
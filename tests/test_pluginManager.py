@@ -0,0 +1,262 @@
+import os
+import shutil
+import tempfile
+import unittest
+import subprocess
+
+import FreeCAD
+import pluginManager
+from pluginManager import Plugin, PluginManager, FetchFromGitHub, \
+    FetchFromWiki
+
+
+class PluginManagerTestCase(unittest.TestCase):
+    """Points FreeCAD's UserAppData to a temporary directory, and replaces
+       the network fetch of the plugin lists by self.workbenches and
+       self.macros (lists of names).
+    """
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        FreeCAD.user_app_data = self.directory
+        self.workbenches = ["sheetmetal"]
+        self.macros = ["Macro Screw"]
+        self.getPluginsLists = (FetchFromGitHub.getPluginsList,
+                                FetchFromWiki.getPluginsList)
+        test = self
+
+        def getWorkbenches(fetch):
+            for name in test.workbenches:
+                plugin = Plugin(name, "https://github.com/x/" + name,
+                                fetch.plugin_type)
+                plugin.fetch = fetch
+                fetch.instances[name] = plugin
+            return list(fetch.instances.values())
+
+        def getMacros(fetch):
+            for name in test.macros:
+                plugin = Plugin(name, "http://wiki/" + name,
+                                fetch.plugin_type)
+                plugin.fetch = fetch
+                fetch.macro_instances.append(plugin)
+            return fetch.macro_instances
+
+        FetchFromGitHub.getPluginsList = getWorkbenches
+        FetchFromWiki.getPluginsList = getMacros
+
+    def tearDown(self):
+        FetchFromGitHub.getPluginsList, FetchFromWiki.getPluginsList = \
+            self.getPluginsLists
+        shutil.rmtree(self.directory)
+
+    def names(self, manager):
+        return sorted(plugin.name for plugin in manager.allPlugins())
+
+
+class CatalogTest(PluginManagerTestCase):
+
+    def test_cached_catalog(self):
+        PluginManager()
+        self.workbenches.append("fasteners")
+        self.assertEqual(self.names(PluginManager(use_cache=True)),
+                         ["Macro Screw", "sheetmetal"])
+        self.assertEqual(self.names(PluginManager(use_cache=True,
+                                                  max_age=0)),
+                         ["Macro Screw", "fasteners", "sheetmetal"])
+
+    def test_saving_info_keeps_the_catalog_age(self):
+        PluginManager()
+        manager = PluginManager(use_cache=True)
+        fetch_time = manager.catalog.data["time"]
+        plugin = manager.getPlugin("Macro Screw")
+        plugin.author = "someone"
+        plugin.version = "1.0"
+        manager.saveCatalog()
+
+        catalog = PluginManager(use_cache=True).catalog.data
+        self.assertEqual(catalog["time"], fetch_time)
+        info = [info for info in catalog["plugins"]
+                if info["name"] == "Macro Screw"][0]
+        self.assertEqual(info["author"], "someone")
+        # Macro versions are always fetched again.
+        self.assertEqual(info["version"], None)
+
+    def test_incomplete_catalog_isnt_cached(self):
+        PluginManager()
+        # The wiki is unreachable.
+        self.macros = []
+        self.workbenches.append("fasteners")
+        manager = PluginManager()
+        self.assertFalse(manager.complete)
+        self.assertEqual(self.names(manager), ["fasteners", "sheetmetal"])
+
+        manager = PluginManager(use_cache=True)
+        self.assertTrue(manager.complete)
+        self.assertEqual(self.names(manager), ["Macro Screw", "sheetmetal"])
+
+
+def git(root, *args):
+    subprocess.check_call(("git", "-c", "user.name=test",
+                           "-c", "user.email=test@example.com") + args,
+                          cwd=root, stdout=subprocess.PIPE)
+
+
+class VerifyTest(PluginManagerTestCase):
+
+    def setUp(self):
+        PluginManagerTestCase.setUp(self)
+        self.manager = PluginManager()
+
+        # A workbench cloned from a repository tracking a symlink.
+        self.workbench = os.path.join(self.directory, "Mod", "sheetmetal")
+        os.makedirs(self.workbench)
+        self.write(os.path.join(self.workbench, "a.py"), "a = 1\n")
+        os.symlink("a.py", os.path.join(self.workbench, "link.py"))
+        git(self.workbench, "init", "-q")
+        git(self.workbench, "add", "-A")
+        git(self.workbench, "commit", "-q", "-m", "Initial")
+
+        self.macro = os.path.join(self.directory, "Macro",
+                                  "Macro Screw_1.0.FCMacro")
+        self.write(self.macro, "print('screw')\n")
+
+    def write(self, path, content):
+        with open(path, "w") as f:
+            f.write(content)
+
+    def statuses(self, **kwargs):
+        return dict((result["name"], result["status"]) for result in
+                    self.manager.verify(**kwargs))
+
+    def test_record_and_verify(self):
+        self.assertEqual(self.statuses(), {"sheetmetal": "unrecorded",
+                                           "Macro Screw": "unrecorded"})
+        self.assertEqual(self.statuses(record=True),
+                         {"sheetmetal": "recorded",
+                          "Macro Screw": "recorded"})
+
+        # Recorded for the next runs too.
+        self.manager = PluginManager(use_cache=True)
+        results = dict((result["name"], result) for result in
+                       self.manager.verify())
+        self.assertEqual(results["sheetmetal"]["status"], "ok")
+        self.assertEqual(results["sheetmetal"]["upstream"], [])
+        self.assertEqual(results["Macro Screw"]["status"], "ok")
+        self.assertEqual(results["Macro Screw"]["upstream"], None)
+
+    def test_modified_and_missing(self):
+        self.manager.verify(record=True)
+        self.write(os.path.join(self.workbench, "a.py"), "a = 2\n")
+        self.write(os.path.join(self.workbench, "b.py"), "b = 1\n")
+        os.remove(self.macro)
+
+        results = dict((result["name"], result) for result in
+                       self.manager.verify())
+        sheetmetal = results["sheetmetal"]
+        self.assertEqual(sheetmetal["status"], "modified")
+        self.assertEqual(sheetmetal["modified"], ["a.py"])
+        self.assertEqual(sheetmetal["added"], ["b.py"])
+        self.assertEqual(sheetmetal["upstream"], ["a.py"])
+        self.assertEqual(results["Macro Screw"]["status"], "missing")
+        self.assertEqual(results["Macro Screw"]["missing"],
+                         ["Macro Screw_1.0.FCMacro"])
+
+    def test_upstream_only(self):
+        # Modified before being recorded: only upstream tells.
+        self.write(os.path.join(self.workbench, "a.py"), "a = 2\n")
+        result = self.manager.verify([self.manager.getPlugin("sheetmetal")])
+        self.assertEqual(result[0]["status"], "unrecorded")
+        self.assertEqual(result[0]["upstream"], ["a.py"])
+
+    def test_converted_line_endings_skip_upstream(self):
+        git(self.workbench, "config", "core.autocrlf", "true")
+        result = self.manager.verify([self.manager.getPlugin("sheetmetal")])
+        self.assertEqual(result[0]["upstream"], None)
+
+    def test_uninstall_removes_the_record(self):
+        self.manager.verify(record=True)
+        self.assertTrue(self.manager.uninstall(
+            self.manager.getPlugin("sheetmetal")))
+        self.assertNotIn("sheetmetal", self.manager.manifest.data)
+        self.assertFalse([path for path in self.manager.hash_cache.data
+                          if path.startswith(self.workbench)])
+        self.assertEqual(self.statuses(), {"Macro Screw": "ok"})
+
+    def test_not_installed(self):
+        os.remove(self.macro)
+        result = self.manager.verify([self.manager.getPlugin("Macro Screw")])
+        self.assertEqual(result[0]["status"], "not installed")
+
+
+class FakeText(object):
+
+    def __init__(self, text):
+        self.text = text
+
+    def getText(self):
+        return self.text
+
+
+class FakeMacroPage(object):
+    "Stands for the parsed wiki page of a macro"
+
+    def __init__(self, code):
+        self.code = code
+
+    def select(self, selector):
+        if self.code is None:
+            return []
+        return [FakeText(self.code)]
+
+
+class MacroInstallTest(PluginManagerTestCase):
+
+    def setUp(self):
+        PluginManagerTestCase.setUp(self)
+        self.manager = PluginManager()
+        self.plugin = self.manager.getPlugin("Macro Screw")
+        # Known already, so getInfo() doesn't use the network.
+        self.plugin.author = "someone"
+        self.plugin.version = "1.0"
+        self.page = FakeMacroPage(u"print('\u00e9crou')\n")
+        self.macroWeb = FetchFromWiki.macroWeb
+        FetchFromWiki.macroWeb = lambda fetch, plugin: self.page
+        self.macro_dir = os.path.join(self.directory, "Macro")
+
+    def tearDown(self):
+        FetchFromWiki.macroWeb = self.macroWeb
+        PluginManagerTestCase.tearDown(self)
+
+    def read(self, name):
+        with open(os.path.join(self.macro_dir, name), "rb") as f:
+            return f.read().decode("utf8")
+
+    def test_install(self):
+        self.assertTrue(self.manager.install(self.plugin))
+        self.assertEqual(self.read("Macro Screw_1.0.FCMacro"),
+                         u"print('\u00e9crou')\n")
+        self.assertEqual(self.manager.manifest.data["Macro Screw"]["path"],
+                         os.path.join(self.macro_dir,
+                                      "Macro Screw_1.0.FCMacro"))
+
+    def test_update(self):
+        self.manager.install(self.plugin)
+        self.plugin.version = "2.0"
+        self.page = FakeMacroPage(u"print(2)\n")
+        self.assertTrue(self.manager.update(self.plugin))
+        self.assertEqual(os.listdir(self.macro_dir),
+                         ["Macro Screw_2.0.FCMacro"])
+        self.assertEqual(self.read("Macro Screw_2.0.FCMacro"), u"print(2)\n")
+        self.assertEqual(self.manager.verify()[0]["status"], "ok")
+
+    def test_failed_update_keeps_the_installed_version(self):
+        self.manager.install(self.plugin)
+        self.plugin.version = "2.0"
+        self.page = FakeMacroPage(None)
+        self.assertFalse(self.manager.update(self.plugin))
+        self.assertEqual(os.listdir(self.macro_dir),
+                         ["Macro Screw_1.0.FCMacro"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,174 @@
+import io
+import sys
+import json
+import threading
+import unittest
+
+import pluginManagerCLI
+
+
+class FakePlugin(object):
+
+    def __init__(self, name, plugin_type="Workbench"):
+        self.name = name
+        self.plugin_type = plugin_type
+        self.plugin_dir = None
+
+    def toDict(self):
+        return {"name": self.name, "plugin_type": self.plugin_type}
+
+
+class FakeStore(object):
+
+    def __init__(self):
+        self.data = {}
+
+
+class FakeManager(object):
+    "Stands for PluginManager, without FreeCAD and the network"
+
+    created = []
+    recorded = []
+
+    def __init__(self, use_cache=False, max_age=None, catalog=None):
+        FakeManager.created.append({"use_cache": use_cache,
+                                    "max_age": max_age, "catalog": catalog})
+        names = ["sheetmetal", "fasteners", "Macro Screw"]
+        if catalog is not None:
+            names = [info["name"] for info in catalog]
+        self.plugins = [FakePlugin(name) for name in names]
+        self.manifest = FakeStore()
+        self.hash_cache = FakeStore()
+
+    def allPlugins(self):
+        return self.plugins
+
+    def getPlugin(self, name):
+        for plugin in self.plugins:
+            if plugin.name == name:
+                return plugin
+
+    def install(self, plugin, record=True):
+        assert not record
+        plugin.plugin_dir = "/Mod/" + plugin.name
+        return True
+
+    def recordManifest(self, plugin):
+        FakeManager.recorded.append(
+            (plugin.name, threading.current_thread().name))
+
+    def verify(self, plugins=None, record=False):
+        return [{"name": "sheetmetal", "status": "modified",
+                 "modified": ["a.py"], "missing": [], "added": []}]
+
+
+def failingFactory(**kwargs):
+    # What PluginManager() does when the catalog can't be fetched.
+    exit()
+
+
+class CLITest(unittest.TestCase):
+
+    def setUp(self):
+        FakeManager.created = []
+        FakeManager.recorded = []
+
+    def run_cli(self, argv, factory=FakeManager):
+        "Returns the exit status, stdout and stderr of the CLI"
+        stdout, stderr = sys.stdout, sys.stderr
+        sys.stdout, sys.stderr = io.StringIO(), io.StringIO()
+        try:
+            status = pluginManagerCLI.main(["--no-service"] + argv, factory)
+            return status, sys.stdout.getvalue(), sys.stderr.getvalue()
+        finally:
+            sys.stdout, sys.stderr = stdout, stderr
+
+    def test_list_json(self):
+        status, out, err = self.run_cli(["--json", "list"])
+        self.assertEqual(status, 0)
+        document = json.loads(out)
+        self.assertEqual(sorted(document), ["command", "elapsed", "ok",
+                                            "results"])
+        self.assertEqual(document["command"], "list")
+        self.assertTrue(document["ok"])
+        self.assertEqual(len(document["results"]), 3)
+
+    def test_catalog_failure(self):
+        status, out, err = self.run_cli(["--json", "list"], failingFactory)
+        self.assertEqual(status, 1)
+        document = json.loads(out)
+        self.assertFalse(document["ok"])
+        self.assertEqual(document["error"], "Couldn't fetch the plugin catalog")
+
+        status, out, err = self.run_cli(["list"], failingFactory)
+        self.assertEqual(status, 1)
+        self.assertEqual(out, "")
+        self.assertIn("Couldn't fetch the plugin catalog", err)
+
+        status, out, err = self.run_cli(["--ndjson", "install", "a", "b"],
+                                        failingFactory)
+        self.assertEqual(status, 1)
+        for line in out.splitlines():
+            self.assertEqual(json.loads(line)["error"],
+                             "Couldn't fetch the plugin catalog")
+
+    def test_sequential_catalog_failure(self):
+        for argv in (["info", "a"], ["-j", "1", "info", "a", "b"]):
+            status, out, err = self.run_cli(["--json"] + argv, failingFactory)
+            self.assertEqual(status, 1)
+            document = json.loads(out)
+            self.assertEqual(document["results"], [])
+            self.assertEqual(document["error"],
+                             "Couldn't fetch the plugin catalog")
+
+    def test_sequential_install(self):
+        status, out, err = self.run_cli(["-j", "1", "install", "sheetmetal",
+                                         "fasteners"])
+        self.assertEqual(status, 0)
+        # A single manager, built once.
+        self.assertEqual(len(FakeManager.created), 1)
+        self.assertEqual(sorted(FakeManager.recorded),
+                         [("fasteners", "MainThread"),
+                          ("sheetmetal", "MainThread")])
+
+    def test_verify(self):
+        status, out, err = self.run_cli(["--json", "verify"])
+        self.assertEqual(status, 1)
+        self.assertEqual(json.loads(out)["results"][0]["status"], "modified")
+
+        status, out, err = self.run_cli(["--json", "verify", "Nope"])
+        self.assertEqual(status, 1)
+        self.assertEqual(json.loads(out)["error"], "Unknown plugin: Nope")
+
+    def test_verify_text_lists_upstream_files(self):
+        record = {"name": "sheetmetal", "status": "modified", "modified": [],
+                  "missing": [], "added": [], "upstream": ["a.py"]}
+        self.assertEqual(pluginManagerCLI.formatText("verify", record),
+                         "sheetmetal: modified a.py")
+
+    def test_parallel_install(self):
+        status, out, err = self.run_cli(
+            ["--ndjson", "-j", "4", "--max-age", "1e9", "install",
+             "sheetmetal", "fasteners", "Nope"])
+        self.assertEqual(status, 1)
+        records = dict((record["name"], record) for record in
+                       map(json.loads, out.splitlines()))
+        self.assertTrue(records["sheetmetal"]["ok"])
+        self.assertTrue(records["fasteners"]["result"])
+        self.assertEqual(records["Nope"]["error"], "Unknown plugin: Nope")
+        self.assertIn("elapsed", records["Nope"])
+
+        # The workers use the catalog of the main manager.
+        main = FakeManager.created[0]
+        self.assertEqual((main["use_cache"], main["max_age"]), (True, 1e9))
+        for worker in FakeManager.created[1:]:
+            self.assertEqual(len(worker["catalog"]), 3)
+
+        # The manifests are recorded by the main thread.
+        self.assertEqual(sorted(FakeManager.recorded),
+                         [("fasteners", "MainThread"),
+                          ("sheetmetal", "MainThread")])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,169 @@
+import os
+import time
+import shutil
+import tempfile
+import threading
+import unittest
+
+import pluginService
+from pluginService import PluginService, PluginClient
+
+
+class FakeFetch(object):
+    "Stands for FetchFromGitHub, without the network"
+
+    def __init__(self, workbench_path):
+        self.workbench_path = workbench_path
+        self.calls = []
+        self.remote_version = "1.0"
+
+    def isInstalled(self, plugin):
+        self.calls.append(("isInstalled", plugin.name))
+        return os.path.exists(os.path.join(self.workbench_path, plugin.name))
+
+    def getInfo(self, plugin):
+        # Like the real fetchers, only fetch what isn't known yet.
+        if plugin.author is None:
+            self.calls.append(("getInfo", plugin.name))
+            plugin.author = "someone"
+            plugin.version = self.remote_version
+        return plugin
+
+    def isUpToDate(self, plugin):
+        return self.getInfo(plugin).version == "1.0"
+
+
+class FakePlugin(object):
+
+    def __init__(self, name, fetch):
+        self.name = name
+        self.plugin_type = "Workbench"
+        self.author = None
+        self.description = None
+        self.version = None
+        self.fetch = fetch
+
+    def toDict(self):
+        return {"name": self.name, "author": self.author}
+
+
+class FakeManager(object):
+
+    def __init__(self, plugins, complete=True):
+        self.plugins = plugins
+        self.complete = complete
+
+    def allPlugins(self):
+        return self.plugins
+
+    def getPlugin(self, name):
+        for plugin in self.plugins:
+            if plugin.name == name:
+                return plugin
+
+    def search(self, keyword):
+        return [plugin for plugin in self.plugins if keyword in plugin.name]
+
+
+class PluginServiceTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.fetch = FakeFetch(self.directory)
+        self.plugins = [FakePlugin("sheetmetal", self.fetch),
+                        FakePlugin("fasteners", self.fetch)]
+        self.service = PluginService(
+            factory=lambda: FakeManager(self.plugins))
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_queries(self):
+        query = self.service.query
+        self.assertEqual(query({"cmd": "ping"}), "pong")
+        self.assertEqual([p["name"] for p in query({"cmd": "list"})],
+                         ["sheetmetal", "fasteners"])
+        self.assertEqual(query({"cmd": "search", "keyword": "fast"}),
+                         [{"name": "fasteners", "author": None}])
+        self.assertEqual(query({"cmd": "info", "name": "fasteners"}),
+                         {"name": "fasteners", "author": "someone"})
+        self.assertRaises(ValueError, query, {"cmd": "info", "name": "Nope"})
+        self.assertRaises(ValueError, query, {"cmd": "nope"})
+
+    def test_installed_state_is_cached_until_the_plugin_changes(self):
+        query = {"cmd": "isInstalled", "name": "sheetmetal"}
+        self.assertFalse(self.service.query(query))
+        self.assertFalse(self.service.query(query))
+        self.assertEqual(len(self.fetch.calls), 1)
+
+        # Installing changes the modification time of the Mod directory.
+        time.sleep(0.01)
+        os.mkdir(os.path.join(self.directory, "sheetmetal"))
+        self.assertTrue(self.service.query(query))
+        self.assertEqual(len(self.fetch.calls), 2)
+
+    def test_refresh_fetches_old_info_again(self):
+        def factory():
+            # Every refresh gives new plugin instances.
+            return FakeManager([FakePlugin("sheetmetal", self.fetch)])
+        service = PluginService(factory=factory, info_max_age=1000)
+        query = {"cmd": "isUpToDate", "name": "sheetmetal"}
+        self.assertTrue(service.query(query))
+
+        # A new version is released.
+        self.fetch.remote_version = "2.0"
+        service.refresh()
+        self.assertTrue(service.query(query))
+        self.assertEqual(self.fetch.calls.count(("getInfo", "sheetmetal")), 1)
+
+        # Once the information is older than info_max_age.
+        service.info_max_age = 0
+        service.refresh()
+        self.assertFalse(service.query(query))
+        self.assertEqual(self.fetch.calls.count(("getInfo", "sheetmetal")), 2)
+
+    def test_failed_first_fetch(self):
+        def factory():
+            exit()
+        self.assertRaises(RuntimeError, PluginService, factory=factory)
+
+    def test_incomplete_refresh_keeps_the_catalog(self):
+        self.service.factory = lambda: FakeManager([], complete=False)
+        self.assertFalse(self.service.refresh())
+        self.assertEqual(len(self.service.query({"cmd": "list"})), 2)
+
+        self.assertRaises(RuntimeError, PluginService,
+                          factory=lambda: FakeManager([], complete=False))
+
+    def test_socket(self):
+        path = os.path.join(self.directory, "test.sock")
+        thread = threading.Thread(target=self.service.serve, args=(path,))
+        thread.daemon = True
+        thread.start()
+        for attempt in range(100):
+            if os.path.exists(path):
+                break
+            time.sleep(0.01)
+
+        with PluginClient(path, timeout=5) as client:
+            self.assertEqual(client.query("ping"), "pong")
+            self.assertEqual(len(client.allPlugins()), 2)
+            self.assertRaises(RuntimeError, client.info, "Nope")
+
+        # A second service doesn't take over the socket of a running one.
+        other = PluginService(factory=lambda: FakeManager(self.plugins))
+        self.assertRaises(RuntimeError, other.serve, path)
+        self.assertTrue(os.path.exists(path))
+
+    def test_private_socket_directory(self):
+        runtime_dir = os.environ.pop("XDG_RUNTIME_DIR", None)
+        try:
+            directory = pluginService.socketDirectory(create=True)
+        finally:
+            if runtime_dir is not None:
+                os.environ["XDG_RUNTIME_DIR"] = runtime_dir
+        self.assertEqual(os.stat(directory).st_mode & 0o077, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()